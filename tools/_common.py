@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+tools下各脚本共用的小工具（subtitle_merger.py、subtitle_stats_generator.py）
+
+- get_file_encoding：检测输入csv编码（utf-8-sig / utf-8 / gbk）
+- positive_int：argparse正整数参数类型
+"""
+import argparse
+import codecs
+
+def get_file_encoding(file_path):
+    """按BOM和试解码判断编码：utf-8-sig / utf-8 / gbk"""
+    with open(file_path, 'rb') as f:
+        if f.read(3) == codecs.BOM_UTF8:
+            return 'utf-8-sig'
+        f.seek(0)
+        # 逐块按utf-8增量解码，遇到第一个含非ASCII字节的块即可判定
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            for block in iter(lambda: f.read(4096), b''):
+                decoder.decode(block)
+                if not block.isascii():
+                    break
+            # 块尾可能截断了多字节字符：逐字节补读直到解码器缓冲清空，读到文件尾则要求完整解码
+            while decoder.getstate()[0]:
+                byte = f.read(1)
+                decoder.decode(byte, final=not byte)
+        except UnicodeDecodeError:
+            return 'gbk'
+    return 'utf-8'
+
+def positive_int(value):
+    """argparse类型：正整数"""
+    ivalue = int(value)
+    if ivalue < 1:
+        raise argparse.ArgumentTypeError(f"必须为正整数: {value}")
+    return ivalue
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+YouTube字幕本地缓存（subtitle_merger.py、subtitle_stats_generator.py共用）
+
+- 缓存目录：data/.transcript_cache（diskcache，线程/进程安全）
+- (video_id, lang) -> YouTubeTranscriptApi.get_transcript 返回的原始字幕列表
+- video_id -> 视频可用字幕语言代码列表
+- 缓存7天过期；抓取失败（抛出异常）或页面中没有字幕信息时不会被缓存
+
+依赖：
+  pip install diskcache youtube-transcript-api
+"""
+import os
+import diskcache
+from youtube_transcript_api import YouTubeTranscriptApi
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+CACHE_DIR = os.path.join(DATA_DIR, '.transcript_cache')
+CACHE_EXPIRE = 7 * 86400
+
+cache = diskcache.Cache(CACHE_DIR)
+
+@cache.memoize(expire=CACHE_EXPIRE)
+def get_transcript(video_id, lang_code):
+    return YouTubeTranscriptApi.get_transcript(video_id, languages=[lang_code])
+
+def get_caption_langs(video_id):
+    """返回缓存的字幕语言代码列表，未缓存时返回None"""
+    return cache.get(('caption_langs', video_id))
+
+def set_caption_langs(video_id, langs):
+    cache.set(('caption_langs', video_id), list(langs), expire=CACHE_EXPIRE)
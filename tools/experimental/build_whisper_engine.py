@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Whisper模型预转换工具
+
+功能:
+  - 将Hugging Face上的openai/whisper-<size>模型转换为CTranslate2格式并量化（默认int8_float16）。
+  - 转换结果保存到仓库根目录的 models/<size>-<quantization>（如 models/small-int8_float16），只需转换一次。
+  - youtube_audio_transcriber.py 优先加载与计算精度对应的目录；没有时加载默认的int8_float16目录
+    （CTranslate2加载时会自动转换精度，如CPU上的int8），免去每次下载/转换。
+
+依赖:
+  pip install ctranslate2 transformers[torch]
+
+用法:
+  python build_whisper_engine.py small
+  python build_whisper_engine.py large-v3 --quantization int8
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '../../models')
+DEFAULT_QUANTIZATION = 'int8_float16'
+
+def engine_dir(model_size: str, quantization: str = DEFAULT_QUANTIZATION, models_dir: str = MODELS_DIR) -> str:
+    """返回预转换模型的保存目录，如 models/small-int8_float16"""
+    return os.path.join(models_dir, f"{model_size}-{quantization}")
+
+def build_engine(model_size: str, quantization: str = DEFAULT_QUANTIZATION,
+                 models_dir: str = MODELS_DIR, force: bool = False) -> str:
+    """调用ct2-transformers-converter转换模型，返回输出目录"""
+    output_dir = engine_dir(model_size, quantization, models_dir)
+    if os.path.isdir(output_dir) and not force:
+        print(f"✅ 模型已存在: {output_dir}")
+        return output_dir
+    os.makedirs(models_dir, exist_ok=True)
+    cmd = [
+        'ct2-transformers-converter',
+        '--model', f"openai/whisper-{model_size}",
+        '--output_dir', output_dir,
+        '--copy_files', 'tokenizer.json', 'preprocessor_config.json',
+        '--quantization', quantization,
+    ]
+    if force:
+        cmd.append('--force')
+    print(f"🔧 正在转换模型: openai/whisper-{model_size} ({quantization})")
+    subprocess.run(cmd, check=True)
+    print(f"✅ 模型已保存: {output_dir}")
+    return output_dir
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper模型预转换工具（CTranslate2量化）")
+    parser.add_argument("model_size", help="Whisper模型大小（tiny, base, small, medium, large-v3）")
+    parser.add_argument("--quantization", type=str, default=DEFAULT_QUANTIZATION,
+                       choices=['int8_float16', 'int8', 'float16'],
+                       help="量化类型，默认int8_float16")
+    parser.add_argument("--models-dir", type=str, default=MODELS_DIR, help="模型输出目录，默认仓库根目录下的models")
+    parser.add_argument("--force", action="store_true", help="已存在时重新转换")
+    args = parser.parse_args()
+
+    try:
+        build_engine(args.model_size, args.quantization, args.models_dir, args.force)
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        print(f"❌ 转换失败: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,19 @@
   - 支持YouTube视频URL或本地音频文件作为输入。
   - 如果是YouTube URL，自动下载音频；如果是本地文件，直接使用。
   - 用faster-whisper模型识别音频，逐句输出文本和起始时间。
-  - 用langdetect识别每句语言（仅限中文、英文、泰文）。
+  - 按Unicode字符区间识别每句语言（仅限中文、英文、泰文）。
   - 支持自定义Whisper模型大小和initial_prompt。
-  - 结果保存为CSV，字段为text、start_time_seconds、language。
+  - 支持指定推理设备和计算精度（默认有GPU时用cuda+int8_float16）。
+  - 存在预转换模型（build_whisper_engine.py生成的models/<size>-<quantization>）时直接加载。
+  - 默认使用VAD切分+批量推理（BatchedInferencePipeline），可用--batch-size调整。
+  - 结果边识别边写入CSV，字段为text、start_time_seconds、language。
   - 自动清理临时音频文件（仅YouTube下载）。
   - 文件名自动添加时间戳，避免重复覆盖。
+  - 支持批量模式（--batch-list），多个输入共用一次模型加载。
 
 依赖:
-  pip install yt-dlp faster-whisper langdetect
+  pip install yt-dlp faster-whisper numpy
+  需要系统已安装ffmpeg
 
 用法:
   # YouTube视频
@@ -25,17 +30,29 @@
   
   # 自定义参数
   python youtube_audio_transcriber.py "audio.mp3" -m large -p "This is a technical discussion"
+  
+  # 指定推理设备和计算精度
+  python youtube_audio_transcriber.py "audio.mp3" --device cuda --compute-type int8_float16
+  
+  # 批量转录（inputs.txt每行一个URL或音频路径，模型只加载一次）
+  python youtube_audio_transcriber.py --batch-list inputs.txt
 """
 import argparse
+import functools
 import os
 import sys
 import subprocess
 import csv
+import glob
 import tempfile
 from datetime import datetime
+from typing import Iterable, Iterator
 from urllib.parse import urlparse, parse_qs
-from langdetect import detect
-from faster_whisper import WhisperModel
+import numpy as np
+import ctranslate2
+from yt_dlp import YoutubeDL
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from build_whisper_engine import DEFAULT_QUANTIZATION, MODELS_DIR, engine_dir
 import pathlib
 
 LANG_MAP = {
@@ -44,19 +61,34 @@ LANG_MAP = {
     'th': 'th',
 }
 
+DEVICE_CHOICES = ['auto', 'cuda', 'cpu']
+COMPUTE_TYPE_CHOICES = ['auto', 'int8_float16', 'float16', 'int8', 'float32']
+
+FIELDNAMES = ['text', 'start_time_seconds', 'language']
+SAMPLE_RATE = 16000  # Whisper要求的采样率
+
+# normalize_lang 的候选语言，顺序与计数数组一致
+_LANG_CODES = ('zh', 'en', 'th')
+
 def normalize_lang(text):
-    try:
-        lang = detect(text)
-        if lang.startswith('zh'):
-            return 'zh'
-        elif lang.startswith('en'):
-            return 'en'
-        elif lang.startswith('th'):
-            return 'th'
-        else:
-            return 'unknown'
-    except Exception:
+    """
+    按Unicode字符区间统计中文字数、英文单词数、泰文字符数，返回占比最多的语言。
+    英文按连续字母计为一个单词，避免中英混说的句子因字母多而被判为英文。
+    """
+    if not text:
         return 'unknown'
+    cp = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    latin = ((cp >= 0x41) & (cp <= 0x5A)) | ((cp >= 0x61) & (cp <= 0x7A))
+    # 英文单词数 = 字母段的起点数
+    en_words = int(latin[0]) + int((latin[1:] & ~latin[:-1]).sum())
+    counts = np.array([
+        ((cp >= 0x4E00) & (cp <= 0x9FFF)).sum(),
+        en_words,
+        ((cp >= 0x0E00) & (cp <= 0x0E7F)).sum(),
+    ])
+    if not counts.any():
+        return 'unknown'
+    return _LANG_CODES[int(counts.argmax())]
 
 def is_youtube_url(input_path: str) -> bool:
     """判断输入是否为YouTube URL"""
@@ -82,38 +114,107 @@ def get_video_id(url: str) -> str | None:
 def download_audio(youtube_url: str, output_dir: str) -> str:
     """下载YouTube音频，返回音频文件路径"""
     print("🎵 正在下载音频...")
-    cmd = [
-        'yt-dlp',
-        '-f', 'bestaudio',
-        '--extract-audio',
-        '--audio-format', 'm4a',
-        '-o', os.path.join(output_dir, '%(id)s.%(ext)s'),
-        youtube_url
-    ]
-    subprocess.run(cmd, check=True)
+    # 进程内调用yt-dlp，省去启动子进程和重复导入的开销；失败时抛出DownloadError
+    # 优先直接下载m4a音频流，不做ffmpeg转码（Whisper可直接读取原始容器）
+    ydl_opts = {
+        'format': 'bestaudio[ext=m4a]/bestaudio',
+        'outtmpl': os.path.join(output_dir, '%(id)s.%(ext)s'),
+        'quiet': True,
+    }
+    with YoutubeDL(ydl_opts) as ydl:
+        ydl.download([youtube_url])
     video_id = get_video_id(youtube_url)
-    audio_path = os.path.join(output_dir, f"{video_id}.m4a")
-    if not os.path.exists(audio_path):
-        raise FileNotFoundError(f"音频文件未找到: {audio_path}")
+    # 实际扩展名取决于下载到的音频流（m4a、webm等）
+    matches = glob.glob(os.path.join(output_dir, f"{glob.escape(video_id)}.*"))
+    if not matches:
+        raise FileNotFoundError(f"音频文件未找到: {os.path.join(output_dir, video_id)}.*")
+    audio_path = matches[0]
     print(f"✅ 音频已保存: {audio_path}")
     return audio_path
 
-def transcribe_audio(audio_path: str, model_size: str = "small", initial_prompt: str = None) -> list:
+def decode_audio(audio_path: str) -> np.ndarray:
+    """用ffmpeg将音频解码为16kHz单声道float32 PCM数组"""
+    cmd = [
+        'ffmpeg', '-nostdin', '-threads', '0',
+        '-i', audio_path,
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE),
+        '-loglevel', 'error',
+        '-'
+    ]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg解码失败: {audio_path}: {e.stderr.decode(errors='replace').strip()}") from e
+    audio = np.frombuffer(proc.stdout, dtype=np.int16).astype(np.float32)
+    audio /= 32768.0
+    return audio
+
+def resolve_device(device: str = "auto", compute_type: str = "auto") -> tuple[str, str]:
+    """
+    解析推理设备和计算精度。
+    
+    device为auto时，有可用CUDA设备则用cuda，否则用cpu；
+    compute_type为auto时，cuda用int8_float16，cpu用int8。设备不支持时（如Pascal架构GPU
+    不支持int8_float16）交给CTranslate2的auto自行选择。
+    """
+    if device == "auto":
+        device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    if compute_type == "auto":
+        preferred = "int8_float16" if device == "cuda" else "int8"
+        if preferred in ctranslate2.get_supported_compute_types(device):
+            compute_type = preferred
+    return device, compute_type
+
+def resolve_model_path(model_size: str, compute_type: str, models_dir: str = MODELS_DIR) -> str:
+    """
+    查找build_whisper_engine.py生成的预转换模型目录：优先models/<size>-<compute_type>，
+    其次默认的models/<size>-int8_float16（CTranslate2加载时会转换为compute_type）。
+    都不存在时原样返回模型大小。
+    """
+    for quantization in (compute_type, DEFAULT_QUANTIZATION):
+        local_dir = engine_dir(model_size, quantization, models_dir)
+        if os.path.isdir(local_dir):
+            return local_dir
+    return model_size
+
+@functools.lru_cache(maxsize=None)
+def load_model(model_size: str = "small", device: str = "auto", compute_type: str = "auto",
+               models_dir: str = MODELS_DIR) -> WhisperModel:
     """
-    用faster-whisper转录音频，返回句子列表（含文本和时间戳）。
+    加载Whisper模型。相同参数只加载一次，批量转录时复用同一个模型。
     
     参数:
-        audio_path: 音频文件路径
         model_size: Whisper模型大小 (tiny, base, small, medium, large)
+        device: 推理设备 (auto, cuda, cpu)
+        compute_type: 计算精度 (auto, int8_float16, float16, int8, float32)
+        models_dir: 预转换模型所在目录
+    """
+    print(f"🔧 使用模型: {model_size}")
+    device, compute_type = resolve_device(device, compute_type)
+    model_path = resolve_model_path(model_size, compute_type, models_dir)
+    if model_path != model_size:
+        print(f"📦 使用预转换模型: {model_path}")
+    model = WhisperModel(model_path, device=device, compute_type=compute_type,
+                         num_workers=1, cpu_threads=os.cpu_count())
+    # 打印实际使用的设备，便于发现静默回退到CPU的情况
+    print(f"🖥️ 推理设备: {model.model.device} ({model.model.compute_type})")
+    return model
+
+def transcribe_one(model: WhisperModel, audio_path: str | np.ndarray, initial_prompt: str = None,
+                   batch_size: int = 16) -> Iterator[dict]:
+    """
+    用已加载的模型转录一个音频，逐句生成识别结果（含文本和时间戳）。
+    
+    参数:
+        model: load_model返回的模型
+        audio_path: 音频文件路径，或decode_audio解码后的PCM数组（多次转录同一音频时可复用）
         initial_prompt: 初始提示，用于指导转录
+        batch_size: 批量推理大小，小于等于1时逐段识别
     """
     print("📝 正在识别音频...")
-    print(f"🔧 使用模型: {model_size}")
     if initial_prompt:
         print(f"💡 使用提示: {initial_prompt}")
     
-    model = WhisperModel(model_size, device="auto", compute_type="auto")
-    
     # 转录参数
     transcribe_kwargs = {
         'beam_size': 5,
@@ -125,22 +226,51 @@ def transcribe_audio(audio_path: str, model_size: str = "small", initial_prompt:
     if initial_prompt:
         transcribe_kwargs['initial_prompt'] = initial_prompt
     
-    segments, info = model.transcribe(audio_path, **transcribe_kwargs)
+    # 只解码一次，直接把PCM数组交给模型
+    audio = decode_audio(audio_path) if isinstance(audio_path, str) else audio_path
+    
+    if batch_size > 1:
+        # 按VAD切分语音段后批量送入编码器，提高GPU利用率
+        # 批量模式默认without_timestamps=True，会把整段VAD切片合成一句，需显式关闭以保持逐句输出
+        pipeline = BatchedInferencePipeline(model=model)
+        segments, info = pipeline.transcribe(audio, batch_size=batch_size, vad_filter=True,
+                                             without_timestamps=False, **transcribe_kwargs)
+    else:
+        segments, info = model.transcribe(audio, **transcribe_kwargs)
     
     # 显示检测信息
     if hasattr(info, 'language') and info.language:
         print(f"Whisper检测到的主要语言: {info.language}")
     
-    results = []
+    count = 0
     for seg in segments:
         text = seg.text.strip()
         if text:
-            results.append({
+            count += 1
+            yield {
                 'text': text,
                 'start': seg.start
-            })
-    print(f"✅ 识别完成，共 {len(results)} 句。")
-    return results
+            }
+    print(f"✅ 识别完成，共 {count} 句。")
+
+def transcribe_audio(audio_path: str | np.ndarray, model_size: str = "small", initial_prompt: str = None,
+                     device: str = "auto", compute_type: str = "auto", batch_size: int = 16,
+                     models_dir: str = MODELS_DIR) -> Iterator[dict]:
+    """
+    用faster-whisper转录音频，逐句生成识别结果（含文本和时间戳）。
+    参数同load_model和transcribe_one。
+    """
+    model = load_model(model_size, device, compute_type, models_dir)
+    yield from transcribe_one(model, audio_path, initial_prompt, batch_size)
+
+def iter_transcript_rows(segments: Iterable[dict]) -> Iterator[dict]:
+    """为每句识别结果标注语言，生成CSV行"""
+    for seg in segments:
+        yield {
+            'text': seg['text'],
+            'start_time_seconds': round(seg['start'], 2),
+            'language': normalize_lang(seg['text'])
+        }
 
 def generate_filename_with_timestamp(base_name: str, model_size: str = "", initial_prompt: str = "") -> str:
     """
@@ -175,108 +305,146 @@ def generate_filename_with_timestamp(base_name: str, model_size: str = "", initi
     filename = "_".join(filename_parts) + ".csv"
     return filename
 
-def save_to_csv(transcripts: list, output_file: str):
-    """将转录结果保存为CSV文件"""
+def stream_to_csv(rows: Iterable[dict], output_file: str, flush_every: int = 50) -> int:
+    """
+    将转录结果逐行写入CSV文件，边识别边落盘，返回写入行数。
+
+    参数:
+        rows: CSV行（可为生成器）
+        output_file: 输出文件名（保存在data目录下）
+        flush_every: 每写入多少行刷新一次文件缓冲
+    
+    rows为生成器时，解码或识别出错会在写入过程中抛出；此时删除未写完的文件再抛出异常。
+    """
     # 确保data目录存在
     data_dir = pathlib.Path('data')
     data_dir.mkdir(parents=True, exist_ok=True)
     output_path = data_dir / output_file
-    with open(output_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        fieldnames = ['text', 'start_time_seconds', 'language']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for item in transcripts:
-            writer.writerow(item)
+    count = 0
+    try:
+        with open(output_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(FIELDNAMES)
+            for item in rows:
+                writer.writerow((item['text'], item['start_time_seconds'], item['language']))
+                count += 1
+                if count % flush_every == 0:
+                    csvfile.flush()
+    except Exception:
+        output_path.unlink(missing_ok=True)
+        raise
     print(f"💾 已保存到: {output_path}")
+    return count
 
-def main():
-    parser = argparse.ArgumentParser(description="音频转录与多语言识别工具")
-    parser.add_argument("input", help="YouTube视频URL或本地音频文件路径")
-    parser.add_argument("-o", "--output_file", type=str, help="输出CSV文件名（可选，默认自动生成带时间戳的文件名）")
-    parser.add_argument("-m", "--model_size", type=str, default="small", 
-                       help="Whisper模型大小（tiny, base, small, medium, large）")
-    parser.add_argument("-p", "--initial_prompt", type=str, default="", 
-                       help="初始提示，用于指导转录（如：'This is a Chinese-English mixed conversation'）")
-    args = parser.parse_args()
+def save_to_csv(transcripts: Iterable[dict], output_file: str):
+    """将转录结果保存为CSV文件"""
+    stream_to_csv(transcripts, output_file)
 
-    # 判断输入类型
-    is_youtube = is_youtube_url(args.input)
+def transcribe_input(input_path: str, args, output_file: str = None):
+    """
+    转录一个输入（YouTube URL或本地音频文件）并写入CSV。
     
-    if is_youtube:
+    参数:
+        input_path: YouTube视频URL或本地音频文件路径
+        args: 命令行参数（模型、设备、提示等）
+        output_file: 输出CSV文件名，为空时自动生成带时间戳的文件名
+    """
+    if is_youtube_url(input_path):
         # YouTube URL处理
-        video_id = get_video_id(args.input)
+        video_id = get_video_id(input_path)
         if not video_id:
-            print("❌ 无法解析视频ID", file=sys.stderr)
-            sys.exit(1)
+            raise ValueError(f"无法解析视频ID: {input_path}")
         
         print(f"🎬 检测到YouTube视频: {video_id}")
         
         with tempfile.TemporaryDirectory() as tmpdir:
-            try:
-                audio_path = download_audio(args.input, tmpdir)
-                segments = transcribe_audio(audio_path, args.model_size, args.initial_prompt)
-                transcripts = []
-                for seg in segments:
-                    lang = normalize_lang(seg['text'])
-                    if lang not in ('zh', 'en', 'th'):
-                        lang = 'unknown'
-                    transcripts.append({
-                        'text': seg['text'],
-                        'start_time_seconds': round(seg['start'], 2),
-                        'language': lang
-                    })
-                
-                # 生成输出文件名
-                if args.output_file:
-                    output_file = args.output_file
-                else:
-                    output_file = generate_filename_with_timestamp(
-                        f"{video_id}_transcript", 
-                        args.model_size, 
-                        args.initial_prompt
-                    )
-                
-                save_to_csv(transcripts, output_file)
-            except Exception as e:
-                print(f"❌ 错误: {e}", file=sys.stderr)
-                sys.exit(1)
-    else:
-        # 本地音频文件处理
-        if not os.path.exists(args.input):
-            print(f"❌ 音频文件不存在: {args.input}", file=sys.stderr)
-            sys.exit(1)
-        
-        print(f"🎵 使用本地音频文件: {args.input}")
-        
-        try:
-            segments = transcribe_audio(args.input, args.model_size, args.initial_prompt)
-            transcripts = []
-            for seg in segments:
-                lang = normalize_lang(seg['text'])
-                if lang not in ('zh', 'en', 'th'):
-                    lang = 'unknown'
-                transcripts.append({
-                    'text': seg['text'],
-                    'start_time_seconds': round(seg['start'], 2),
-                    'language': lang
-                })
+            audio_path = download_audio(input_path, tmpdir)
             
             # 生成输出文件名
-            if args.output_file:
-                output_file = args.output_file
-            else:
-                # 使用输入文件名作为基础
-                base_name = os.path.splitext(os.path.basename(args.input))[0]
+            if not output_file:
                 output_file = generate_filename_with_timestamp(
-                    f"{base_name}_transcript", 
+                    f"{video_id}_transcript", 
                     args.model_size, 
                     args.initial_prompt
                 )
             
-            save_to_csv(transcripts, output_file)
-        except Exception as e:
-            print(f"❌ 错误: {e}", file=sys.stderr)
+            model = load_model(args.model_size, args.device, args.compute_type, args.models_dir)
+            segments = transcribe_one(model, audio_path, args.initial_prompt, args.batch_size)
+            stream_to_csv(iter_transcript_rows(segments), output_file)
+    else:
+        # 本地音频文件处理
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"音频文件不存在: {input_path}")
+        
+        print(f"🎵 使用本地音频文件: {input_path}")
+        
+        # 生成输出文件名
+        if not output_file:
+            # 使用输入文件名作为基础
+            base_name = os.path.splitext(os.path.basename(input_path))[0]
+            output_file = generate_filename_with_timestamp(
+                f"{base_name}_transcript", 
+                args.model_size, 
+                args.initial_prompt
+            )
+        
+        model = load_model(args.model_size, args.device, args.compute_type, args.models_dir)
+        segments = transcribe_one(model, input_path, args.initial_prompt, args.batch_size)
+        stream_to_csv(iter_transcript_rows(segments), output_file)
+
+def read_batch_list(list_file: str) -> list[str]:
+    """读取批量输入列表，每行一个URL或音频路径，忽略空行和#开头的注释行"""
+    with open(list_file, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+def main():
+    parser = argparse.ArgumentParser(description="音频转录与多语言识别工具")
+    parser.add_argument("input", nargs="?", help="YouTube视频URL或本地音频文件路径")
+    parser.add_argument("-o", "--output_file", type=str, help="输出CSV文件名（可选，默认自动生成带时间戳的文件名）")
+    parser.add_argument("-m", "--model_size", type=str, default="small", 
+                       help="Whisper模型大小（tiny, base, small, medium, large）")
+    parser.add_argument("-p", "--initial_prompt", type=str, default="", 
+                       help="初始提示，用于指导转录（如：'This is a Chinese-English mixed conversation'）")
+    parser.add_argument("--device", type=str, default="auto", choices=DEVICE_CHOICES,
+                       help="推理设备，auto表示有CUDA时用cuda，否则用cpu")
+    parser.add_argument("--compute-type", type=str, default="auto", choices=COMPUTE_TYPE_CHOICES,
+                       help="计算精度，auto表示cuda用int8_float16，cpu用int8（设备不支持时由CTranslate2自动选择）")
+    parser.add_argument("--batch-size", type=int, default=16,
+                       help="批量推理大小（默认16），设为1则逐段识别")
+    parser.add_argument("--models-dir", type=str, default=MODELS_DIR,
+                       help="预转换模型目录（与build_whisper_engine.py的--models-dir一致），默认仓库根目录下的models")
+    parser.add_argument("--batch-list", type=str,
+                       help="批量模式：文本文件，每行一个YouTube URL或本地音频路径，所有输入共用同一个模型")
+    args = parser.parse_args()
+
+    if args.batch_list:
+        if args.input or args.output_file:
+            parser.error("--batch-list 不能与 input 或 -o 同时使用")
+        try:
+            inputs = read_batch_list(args.batch_list)
+        except OSError as e:
+            print(f"❌ 无法读取批量列表: {e}", file=sys.stderr)
             sys.exit(1)
+        failed = []
+        for idx, input_path in enumerate(inputs, 1):
+            print(f"[{idx}/{len(inputs)}] {input_path}")
+            try:
+                transcribe_input(input_path, args)
+            except Exception as e:
+                print(f"❌ 错误: {e}", file=sys.stderr)
+                failed.append(input_path)
+        print(f"✅ 批量转录完成: 成功 {len(inputs) - len(failed)} 个，失败 {len(failed)} 个")
+        if failed:
+            sys.exit(1)
+        return
+
+    if not args.input:
+        parser.error("需要提供 input 或 --batch-list")
+    try:
+        transcribe_input(args.input, args, args.output_file)
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
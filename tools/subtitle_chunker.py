@@ -41,6 +41,9 @@ import os
 from urllib.parse import urlparse, parse_qs
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled
 
+FIELDNAMES = ['text', 'video_url', 'start_time_seconds', 'speaker']
+WRITE_BUFFER_SIZE = 1 << 20  # 1MB写缓冲
+
 
 def get_video_id(url: str) -> str | None:
     """
@@ -72,42 +75,40 @@ def chunk_transcript(transcript: list[dict], min_chunk_time: float) -> list[dict
     Returns:
         一个包含分块后字幕的字典列表。
     """
-    chunks = []
-    current_chunk_text = []
-    current_chunk_start_time = None
-    current_chunk_duration = 0.0
-
     if not transcript:
         return []
 
-    for item in transcript:
-        if current_chunk_start_time is None:
-            current_chunk_start_time = item['start']
+    # 只记录每个分块的起止下标，分块结束时再一次性拼接文本，避免逐条维护中间列表
+    # 每个分块至少包含一条字幕，分块数不会超过字幕条数
+    chunks = [None] * len(transcript)
+    n_chunks = 0
+    chunk_start_idx = 0
+    current_chunk_duration = 0.0
 
-        current_chunk_text.append(item['text'])
+    for idx, item in enumerate(transcript):
         # 累加每个字幕段的实际持续时间
         current_chunk_duration += item['duration']
 
         # 如果当前分块的累积时长已达到或超过最小要求
         if current_chunk_duration >= min_chunk_time:
             # 合并文本并创建分块
-            full_text = " ".join(current_chunk_text)
-            chunks.append({
-                'text': full_text,
-                'start_time': current_chunk_start_time
-            })
+            chunks[n_chunks] = {
+                'text': " ".join(t['text'] for t in transcript[chunk_start_idx:idx + 1]),
+                'start_time': transcript[chunk_start_idx]['start']
+            }
+            n_chunks += 1
             # 重置下一个分块
-            current_chunk_text = []
-            current_chunk_start_time = None
+            chunk_start_idx = idx + 1
             current_chunk_duration = 0.0
 
     # 处理循环结束后剩余的最后一部分字幕
-    if current_chunk_text:
-        full_text = " ".join(current_chunk_text)
-        chunks.append({
-            'text': full_text,
-            'start_time': current_chunk_start_time
-        })
+    if chunk_start_idx < len(transcript):
+        chunks[n_chunks] = {
+            'text': " ".join(t['text'] for t in transcript[chunk_start_idx:]),
+            'start_time': transcript[chunk_start_idx]['start']
+        }
+        n_chunks += 1
+    del chunks[n_chunks:]
 
     print(f"⚙️字幕已处理成 {len(chunks)} 个分块。")
     return chunks
@@ -117,19 +118,15 @@ def save_to_csv(chunks: list[dict], output_file: str, video_url: str, speaker: s
     将分块后的字幕数据保存到CSV文件。
     """
     try:
-        with open(output_file, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        with open(output_file, 'w', newline='', encoding='utf-8-sig', buffering=WRITE_BUFFER_SIZE) as csvfile:
             # utf-8-sig 编码可以帮助Excel正确识别UTF-8
-            fieldnames = ['text', 'video_url', 'start_time_seconds', 'speaker']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for chunk in chunks:
-                writer.writerow({
-                    'text': chunk['text'],
-                    'video_url': video_url,
-                    'start_time_seconds': round(chunk['start_time'], 2), # 保留两位小数
-                    'speaker': speaker
-                })
+            writer = csv.writer(csvfile)
+
+            writer.writerow(FIELDNAMES)
+            writer.writerows(
+                # 起始时间保留两位小数
+                (chunk['text'], video_url, round(chunk['start_time'], 2), speaker) for chunk in chunks
+            )
         print(f"💾成功保存到文件: {output_file}")
     except IOError as e:
         print(f"❌错误：无法写入文件 {output_file}。原因: {e}", file=sys.stderr)
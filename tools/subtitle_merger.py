@@ -9,23 +9,27 @@
 - 合并为.data文件，仿照字幕csv格式
 - 追踪表csv，记录每个video_id、语言、合并到的数据文件名、处理时间
 - 支持参数：最大抓取视频数（默认40，all为全部）
+- 组内视频字幕并发抓取（--concurrency，默认8线程）
+- 原始字幕缓存到data/.transcript_cache（7天），重跑时不重复请求YouTube
 - 支持断点续传（已处理的video_id+语言组合自动跳过）
 - 所有输出到data目录
 
 用法示例：
   python subtitle_merger.py --source-csv ../data/ds_jietuoyuan.csv --group-size 20 --max-videos 40
-  python subtitle_merger.py --source-csv ../data/ds_luangpupramote.csv --group-size 20 --max-videos all
+  python subtitle_merger.py --source-csv ../data/ds_luangpupramote.csv --group-size 20 --max-videos all --concurrency 4
 
 依赖：
-  pip install youtube-transcript-api chardet
+  pip install youtube-transcript-api diskcache
 """
 import os
 import csv
 import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled
-import chardet
+from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+from _transcript_cache import get_transcript
+from _common import get_file_encoding, positive_int
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
 TRACKING_FILE = os.path.join(DATA_DIR, 'subtitle_merge_tracking.csv')
@@ -37,34 +41,22 @@ LANG_GROUPS = {
 }
 LANG_ORDER = ['zh', 'en', 'th']
 FIELDNAMES = ['text', 'video_url', 'start_time_seconds', 'speaker']
+TRACKING_FIELDNAMES = ['video_id', 'lang', 'merged_file', 'processed_time']
+WRITE_BUFFER_SIZE = 1 << 20  # 输出文件写缓冲1MB，把大量小write合并为少数几次系统调用
 
 def load_tracking():
     processed = set()
-    table = []
     if os.path.exists(TRACKING_FILE):
         with open(TRACKING_FILE, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
                 processed.add((row['video_id'], row['lang']))
-                table.append(row)
-    return processed, table
-
-def save_tracking(table):
-    with open(TRACKING_FILE, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['video_id', 'lang', 'merged_file', 'processed_time']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in table:
-            writer.writerow(row)
-
-def get_file_encoding(file_path):
-    with open(file_path, 'rb') as f:
-        raw = f.read(4096)
-    result = chardet.detect(raw)
-    encoding = result['encoding'] or 'utf-8'
-    if encoding.lower() in ['gb2312', 'gb18030']:
-        encoding = 'gbk'
-    return encoding
+    return processed
+
+def append_tracking(f, writer, rows):
+    """追加本组的追踪记录并立即落盘（只写新增行，不重写整个追踪表）"""
+    writer.writerows(tuple(row[k] for k in TRACKING_FIELDNAMES) for row in rows)
+    f.flush()
 
 def get_video_list(source_csv):
     """读取数据源csv，返回(video_id, title, url, subtitle)列表，最新在前（自动检测编码）"""
@@ -83,7 +75,7 @@ def get_video_list(source_csv):
 
 def fetch_transcript(video_id, lang_code):
     try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=[lang_code])
+        transcript = get_transcript(video_id, lang_code)
         return transcript
     except (NoTranscriptFound, TranscriptsDisabled):
         return None
@@ -91,37 +83,38 @@ def fetch_transcript(video_id, lang_code):
         print(f"[{video_id}] 抓取字幕失败: {e}")
         return None
 
-def merge_and_save(group, lang, part_idx, source_name):
+def merge_and_save(group, lang, part_idx, source_name, concurrency=8):
     merged_lines = []
     tracking_rows = []
-    for v in group:
+    speaker = '老师' if lang == 'zh' else ('Ajahn' if lang == 'th' else 'Speaker')
+    lang_code = LANG_GROUPS[lang][0]
+    merged_file = f"{source_name}_{lang}_part{part_idx}.data"
+    # 并发抓取本组字幕，结果顺序与group一致
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        transcripts = list(ex.map(lambda v: fetch_transcript(v['video_id'], lang_code), group))
+    # 同组视频共用一个处理时间
+    ts = datetime.now().isoformat(timespec='seconds')
+    for v, transcript in zip(group, transcripts):
         video_id = v['video_id']
         url = v['url']
-        speaker = '老师' if lang == 'zh' else ('Ajahn' if lang == 'th' else 'Speaker')
-        transcript = fetch_transcript(video_id, lang_code=LANG_GROUPS[lang][0])
         if not transcript:
             print(f"[跳过] {video_id} 无{lang}字幕")
             continue
-        for entry in transcript:
-            merged_lines.append({
-                'text': entry['text'],
-                'video_url': url,
-                'start_time_seconds': round(entry['start'], 2),
-                'speaker': speaker
-            })
+        merged_lines.extend(
+            (entry['text'], url, round(entry['start'], 2), speaker) for entry in transcript
+        )
         tracking_rows.append({
             'video_id': video_id,
             'lang': lang,
-            'merged_file': f"{source_name}_{lang}_part{part_idx}.data",
-            'processed_time': datetime.now().isoformat(timespec='seconds')
+            'merged_file': merged_file,
+            'processed_time': ts
         })
     if merged_lines:
-        out_path = os.path.join(DATA_DIR, f"{source_name}_{lang}_part{part_idx}.data")
-        with open(out_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
-            writer.writeheader()
-            for row in merged_lines:
-                writer.writerow(row)
+        out_path = os.path.join(DATA_DIR, merged_file)
+        with open(out_path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDNAMES)
+            writer.writerows(merged_lines)
         print(f"✅ 生成: {out_path} ({len(merged_lines)} 条字幕)")
     return tracking_rows
 
@@ -131,10 +124,11 @@ def main():
     parser.add_argument('--group-size', type=int, default=20, help='每个数据文件包含视频数')
     parser.add_argument('--max-videos', default=40, help='最大抓取有字幕视频数，all为全部')
     parser.add_argument('--source-name', type=str, default=None, help='数据源名（如JieTuoYuan），默认取csv文件名')
+    parser.add_argument('--concurrency', type=positive_int, default=8, help='并发抓取字幕的线程数，默认8')
     args = parser.parse_args()
 
     os.makedirs(DATA_DIR, exist_ok=True)
-    processed, tracking_table = load_tracking()
+    processed = load_tracking()
     videos = get_video_list(args.source_csv)
     source_name = args.source_name or os.path.splitext(os.path.basename(args.source_csv))[0]
 
@@ -147,34 +141,37 @@ def main():
     for v in videos:
         video_id = v['video_id']
         subtitle = v.get('subtitle', '')
+        avail = set(subtitle.split(',')) if subtitle else ()
         for lang in LANG_ORDER:
             if count_per_lang[lang] == max_videos:
                 continue
             if (video_id, lang) in processed:
                 continue  # 已处理
-            if lang in subtitle.split(','):
+            if lang in avail:
                 lang_video_lists[lang].append(v)
                 count_per_lang[lang] += 1
 
-    # 分组合并
-    for lang in LANG_ORDER:
-        group = []
-        part_idx = 1
-        for v in lang_video_lists[lang]:
-            if (v['video_id'], lang) in processed:
-                continue
-            group.append(v)
-            if len(group) == args.group_size:
-                tracking_rows = merge_and_save(group, lang, part_idx, source_name)
-                tracking_table.extend(tracking_rows)
-                save_tracking(tracking_table)
-                group = []
-                part_idx += 1
-        # 处理最后不足一组的
-        if group:
-            tracking_rows = merge_and_save(group, lang, part_idx, source_name)
-            tracking_table.extend(tracking_rows)
-            save_tracking(tracking_table)
+    # 分组合并，追踪表以追加模式保持打开
+    with open(TRACKING_FILE, 'a', newline='', encoding='utf-8') as tracking_file:
+        tracking_writer = csv.writer(tracking_file)
+        if tracking_file.tell() == 0:
+            tracking_writer.writerow(TRACKING_FIELDNAMES)
+        for lang in LANG_ORDER:
+            group = []
+            part_idx = 1
+            for v in lang_video_lists[lang]:
+                if (v['video_id'], lang) in processed:
+                    continue
+                group.append(v)
+                if len(group) == args.group_size:
+                    tracking_rows = merge_and_save(group, lang, part_idx, source_name, args.concurrency)
+                    append_tracking(tracking_file, tracking_writer, tracking_rows)
+                    group = []
+                    part_idx += 1
+            # 处理最后不足一组的
+            if group:
+                tracking_rows = merge_and_save(group, lang, part_idx, source_name, args.concurrency)
+                append_tracking(tracking_file, tracking_writer, tracking_rows)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -6,8 +6,14 @@
 import argparse
 import csv
 import os
+import re
 from collections import defaultdict
-from typing import List, Dict
+from typing import Dict, Iterator, List
+import numpy as np
+
+FIELDNAMES = ['text', 'video_url', 'start_time_seconds', 'speaker']
+_VID_RE = re.compile(r'v=([\w-]+)')
+WRITE_BUFFER_SIZE = 1 << 20  # 1MB写缓冲
 
 def chunk_transcript(transcript: List[Dict], min_chunk_time: float) -> List[Dict]:
     """
@@ -18,67 +24,67 @@ def chunk_transcript(transcript: List[Dict], min_chunk_time: float) -> List[Dict
     Returns:
         一个包含分块后字幕的字典列表。
     """
-    chunks = []
-    current_chunk_text = []
-    current_chunk_start_time = None
-    current_chunk_duration = 0.0
     if not transcript:
         return []
-    for item in transcript:
-        if current_chunk_start_time is None:
-            current_chunk_start_time = item['start']
-        current_chunk_text.append(item['text'])
+    # 只记录分块起止下标，分块数不超过字幕条数，预分配后按下标写入
+    chunks = [None] * len(transcript)
+    n_chunks = 0
+    chunk_start_idx = 0
+    current_chunk_duration = 0.0
+    for idx, item in enumerate(transcript):
         current_chunk_duration += item['duration']
         if current_chunk_duration >= min_chunk_time:
-            full_text = " ".join(current_chunk_text)
-            chunks.append({
-                'text': full_text,
-                'start_time': current_chunk_start_time
-            })
-            current_chunk_text = []
-            current_chunk_start_time = None
+            chunks[n_chunks] = {
+                'text': " ".join(t['text'] for t in transcript[chunk_start_idx:idx + 1]),
+                'start_time': transcript[chunk_start_idx]['start']
+            }
+            n_chunks += 1
+            chunk_start_idx = idx + 1
             current_chunk_duration = 0.0
-    if current_chunk_text:
-        full_text = " ".join(current_chunk_text)
-        chunks.append({
-            'text': full_text,
-            'start_time': current_chunk_start_time
-        })
+    if chunk_start_idx < len(transcript):
+        chunks[n_chunks] = {
+            'text': " ".join(t['text'] for t in transcript[chunk_start_idx:]),
+            'start_time': transcript[chunk_start_idx]['start']
+        }
+        n_chunks += 1
+    del chunks[n_chunks:]
     return chunks
 
-def read_merger_data(file_path: str) -> List[Dict]:
-    rows = []
+def read_merger_data(file_path: str) -> Iterator[Dict]:
+    """逐行读取 .data 字幕文件"""
     with open(file_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append(row)
-    return rows
+        yield from csv.DictReader(f)
 
-def build_transcript(rows: List[Dict]) -> List[Dict]:
-    transcript = []
-    for i, row in enumerate(rows):
-        start = float(row['start_time_seconds'])
-        if i < len(rows) - 1:
-            duration = float(rows[i+1]['start_time_seconds']) - start
-            if duration <= 0:
-                duration = 2.0
-        else:
-            duration = 2.0
-        transcript.append({'text': row['text'], 'start': start, 'duration': duration})
-    return transcript
+def parse_starts(rows: List[Dict]) -> np.ndarray:
+    """将每行的 start_time_seconds 解析为 float64 数组（每行只解析一次）"""
+    return np.fromiter((float(r['start_time_seconds']) for r in rows), dtype=np.float64, count=len(rows))
+
+def build_transcript(rows: List[Dict], starts: np.ndarray = None) -> List[Dict]:
+    """
+    根据相邻字幕的起始时间差计算每条字幕的时长。
+    starts 为已解析的起始时间数组（与 rows 一一对应），不传则从 rows 解析。
+    """
+    if not rows:
+        return []
+    if starts is None:
+        starts = parse_starts(rows)
+    # 时长 = 下一条起始时间 - 本条起始时间，最后一条及非正时长按2秒计
+    durations = np.empty_like(starts)
+    durations[:-1] = np.diff(starts)
+    durations[-1] = 2.0
+    durations[durations <= 0] = 2.0
+    return [
+        {'text': r['text'], 'start': s, 'duration': d}
+        for r, s, d in zip(rows, starts.tolist(), durations.tolist())
+    ]
 
 def save_chunks_to_csv(chunks: List[Dict], output_file: str, video_url: str, speaker: str):
-    with open(output_file, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        fieldnames = ['text', 'video_url', 'start_time_seconds', 'speaker']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for chunk in chunks:
-            writer.writerow({
-                'text': chunk['text'],
-                'video_url': video_url,
-                'start_time_seconds': round(chunk['start_time'], 2),
-                'speaker': speaker
-            })
+    with open(output_file, 'w', newline='', encoding='utf-8-sig', buffering=WRITE_BUFFER_SIZE) as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(FIELDNAMES)
+        writer.writerows(
+            (chunk['text'], video_url, round(chunk['start_time'], 2), speaker) for chunk in chunks
+        )
 
 def main():
     parser = argparse.ArgumentParser(description="将 merger 生成的字幕文件按视频分组并分块合并。")
@@ -88,21 +94,22 @@ def main():
     args = parser.parse_args()
 
     os.makedirs(args.output_dir, exist_ok=True)
-    rows = read_merger_data(args.input_file)
-    if not rows:
-        print(f"未读取到任何字幕数据: {args.input_file}")
-        return
-    # 按 video_url 分组
+    # 边读取边按 video_url 分组
     video_groups = defaultdict(list)
-    for row in rows:
+    for row in read_merger_data(args.input_file):
         video_groups[row['video_url']].append(row)
+    if not video_groups:
+        print(f"未读取到任何字幕数据: {args.input_file}")
+        return
     # 获取原始文件名（不含扩展名）
     base_name = os.path.splitext(os.path.basename(args.input_file))[0]
     all_chunks = []
     for video_url, group_rows in video_groups.items():
-        # 按 start_time_seconds 排序
-        group_rows.sort(key=lambda r: float(r['start_time_seconds']))
-        transcript = build_transcript(group_rows)
+        # 按 start_time_seconds 排序（稳定排序，起始时间只解析一次）
+        starts = parse_starts(group_rows)
+        order = np.argsort(starts, kind='stable')
+        group_rows = [group_rows[i] for i in order]
+        transcript = build_transcript(group_rows, starts[order])
         chunks = chunk_transcript(transcript, args.min_chunk_time)
         if not chunks:
             print(f"视频 {video_url} 未生成任何 chunk，跳过。")
@@ -110,31 +117,24 @@ def main():
         # 取 video_id
         video_id = None
         # 尝试从 url 提取 v=xxx
-        import re
-        m = re.search(r'v=([\w-]+)', video_url)
+        m = _VID_RE.search(video_url)
         if m:
             video_id = m.group(1)
         else:
             video_id = video_url[-11:]  # fallback
         speaker = group_rows[0].get('speaker', '')
-        for chunk in chunks:
-            all_chunks.append({
-                'text': chunk['text'],
-                'video_url': video_url,
-                'start_time_seconds': round(chunk['start_time'], 2),
-                'speaker': speaker
-            })
+        all_chunks.extend(
+            (chunk['text'], video_url, round(chunk['start_time'], 2), speaker) for chunk in chunks
+        )
     # 输出到一个文件
     output_file = os.path.join(
         args.output_dir,
         f"{base_name}_chunk{int(args.min_chunk_time)}s.csv"
     )
-    with open(output_file, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        fieldnames = ['text', 'video_url', 'start_time_seconds', 'speaker']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in all_chunks:
-            writer.writerow(row)
+    with open(output_file, 'w', newline='', encoding='utf-8-sig', buffering=WRITE_BUFFER_SIZE) as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(FIELDNAMES)
+        writer.writerows(all_chunks)
     print(f"✅ 已生成: {output_file}（共 {len(all_chunks)} 段）")
 
 if __name__ == "__main__":
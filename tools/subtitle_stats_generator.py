@@ -5,54 +5,109 @@
 
 功能：
 - 输入：原始视频列表csv（含video_id、title、url等）
-- 对每个视频，远程检测所有可用字幕语言（用YouTubeTranscriptApi.list_transcripts）
+- 对每个视频，远程检测所有可用字幕语言（asyncio + httpx并发请求视频页，解析captionTracks）
 - 生成/更新csv，增加subtitle字段（如zh,en,th）
 - 输出：如ds_jietuoyuan.csv，含subtitle字段
 - 支持自动检测输入文件编码，输出为utf-8
+- 检测结果缓存到data/.transcript_cache（7天），重跑时不重复请求
+- 支持并发检测（--concurrency，默认32个并发请求）
 - 支持进度输出
+- 检测失败（限流、视频不可用、网络错误）的视频subtitle记为error（输入中已有检测结果时保留原值），
+  失败结果不缓存，重新运行即可重试
 
 用法示例：
   python subtitle_stats_generator.py --input-csv ../data/video_list.csv --output-csv ../data/ds_jietuoyuan.csv
 
 依赖：
-  pip install youtube-transcript-api chardet
+  pip install "httpx[http2]" diskcache
 """
 import os
 import csv
+import json
 import argparse
-import chardet
-from youtube_transcript_api import YouTubeTranscriptApi
+import asyncio
+import httpx
+from _transcript_cache import get_caption_langs, set_caption_langs
+from _common import get_file_encoding, positive_int
 
-def get_file_encoding(file_path):
-    with open(file_path, 'rb') as f:
-        raw = f.read(4096)
-    result = chardet.detect(raw)
-    encoding = result['encoding'] or 'utf-8'
-    if encoding.lower() in ['gb2312', 'gb18030']:
-        encoding = 'gbk'
-    return encoding
+WATCH_URL = 'https://www.youtube.com/watch?v={video_id}'
+SUBTITLE_FAILED = 'error'  # 检测失败标记，与无字幕（空字符串）区分
 
-def detect_subtitles(video_id):
-    try:
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        langs = [t.language_code for t in transcript_list]
-        # 归一化为zh/en/th三类
-        lang_set = set()
-        for code in langs:
-            if code.startswith('zh'):
-                lang_set.add('zh')
-            elif code.startswith('en'):
-                lang_set.add('en')
-            elif code.startswith('th'):
-                lang_set.add('th')
-        return ','.join(sorted(lang_set))
-    except Exception as e:
+def normalize_langs(langs):
+    # 归一化为zh/en/th三类
+    lang_set = set()
+    for code in langs:
+        if code.startswith('zh'):
+            lang_set.add('zh')
+        elif code.startswith('en'):
+            lang_set.add('en')
+        elif code.startswith('th'):
+            lang_set.add('th')
+    return ','.join(sorted(lang_set))
+
+def parse_caption_langs(html):
+    """
+    从视频页html中解析字幕轨道的语言代码（与youtube-transcript-api相同的解析方式）。
+    页面被限流（reCAPTCHA）或视频不可用时抛出RuntimeError，不当作无字幕处理；
+    页面正常但没有captions块时返回None。
+    """
+    parts = html.split('"captions":')
+    if len(parts) <= 1:
+        if 'class="g-recaptcha"' in html:
+            raise RuntimeError('请求过多，YouTube要求人机验证')
+        if '"playabilityStatus":' not in html:
+            raise RuntimeError('视频不可用或页面无效')
+        return None
+    captions = json.loads(parts[1].split(',"videoDetails')[0].replace('\n', ''))
+    tracks = captions.get('playerCaptionsTracklistRenderer', {}).get('captionTracks', [])
+    return [t['languageCode'] for t in tracks if 'languageCode' in t]
+
+async def detect_subtitles(client, video_id):
+    """返回归一化后的字幕语言（如en,zh），无字幕返回空字符串；请求或解析失败时抛出异常"""
+    langs = get_caption_langs(video_id)
+    if langs is not None:
+        return normalize_langs(langs)
+    resp = await client.get(WATCH_URL.format(video_id=video_id))
+    resp.raise_for_status()
+    langs = parse_caption_langs(resp.text)
+    if langs is None:
         return ''
+    # 只缓存真正解析到captions块的结果
+    set_caption_langs(video_id, langs)
+    return normalize_langs(langs)
+
+async def gather_with_semaphore(video_ids, concurrency=32):
+    """并发检测所有视频的字幕，返回结果顺序与video_ids一致（无video_id或检测失败的返回None）"""
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(video_ids)
+
+    async def worker(client, idx, video_id):
+        if not video_id:
+            return None
+        async with semaphore:
+            try:
+                subtitle = await detect_subtitles(client, video_id)
+            except Exception as e:
+                print(f"[{idx}/{total}] {video_id} -> 检测失败: {e}")
+                return None
+        print(f"[{idx}/{total}] {video_id} -> {subtitle}")
+        return subtitle
+
+    async with httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        headers={'Accept-Language': 'en-US'},
+        cookies={'CONSENT': 'YES+cb'},
+    ) as client:
+        return await asyncio.gather(
+            *(worker(client, idx, vid) for idx, vid in enumerate(video_ids, 1))
+        )
 
 def main():
     parser = argparse.ArgumentParser(description="YouTube字幕统计与元数据生成脚本")
     parser.add_argument('--input-csv', required=True, help='原始视频列表csv路径')
     parser.add_argument('--output-csv', required=True, help='输出csv路径（含subtitle字段）')
+    parser.add_argument('--concurrency', type=positive_int, default=32, help='并发请求数，默认32')
     args = parser.parse_args()
 
     encoding = get_file_encoding(args.input_csv)
@@ -61,22 +116,27 @@ def main():
         rows = list(reader)
 
     out_rows = []
-    for idx, row in enumerate(rows, 1):
-        video_id = row.get('video_id') or row.get('id')
+    failed = 0
+    video_ids = [row.get('video_id') or row.get('id') for row in rows]
+    subtitles = asyncio.run(gather_with_semaphore(video_ids, args.concurrency))
+    for row, video_id, subtitle in zip(rows, video_ids, subtitles):
         if not video_id:
             continue
-        subtitle = detect_subtitles(video_id)
+        if subtitle is None:
+            failed += 1
+            # 保留输入中已有的检测结果，否则标记为失败
+            subtitle = row.get('subtitle') or SUBTITLE_FAILED
         row['subtitle'] = subtitle
         out_rows.append(row)
-        print(f"[{idx}/{len(rows)}] {video_id} -> {subtitle}")
 
     fieldnames = list(out_rows[0].keys()) if out_rows else []
     with open(args.output_csv, 'w', newline='', encoding='utf-8') as fout:
-        writer = csv.DictWriter(fout, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in out_rows:
-            writer.writerow(row)
+        writer = csv.writer(fout)
+        writer.writerow(fieldnames)
+        writer.writerows(tuple(row.get(k, '') for k in fieldnames) for row in out_rows)
     print(f"✅ 已生成: {args.output_csv}，共{len(out_rows)}条")
+    if failed:
+        print(f"⚠️ {failed}个视频检测失败（subtitle为{SUBTITLE_FAILED}或保留原值），可重新运行重试")
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file